@@ -6,6 +6,8 @@ use clap::{App, Arg};
 
 pub const HEADER_LENGTH: usize = 48;
 pub const ALIVE_MSG_INTERVALL: u64 = 60*60*4;
+/// Seconds without incoming data before a client connection is dropped
+pub const READ_TIMEOUT: u64 = 60;
 
 /// Server configuration from command line arguments
 #[derive(Debug, Clone, PartialEq)]
@@ -7,14 +7,12 @@ use std::num;
 use std::io;
 use std::io::Cursor;
 use std::f64::{INFINITY, NEG_INFINITY, NAN};
-use std::fs::File;
-use std::io::Read;
+use std::fs;
 use std::fmt;
 
 // External modules:
-use chrono::{NaiveDateTime};
+use chrono::{NaiveDate, NaiveDateTime};
 use time::{Duration};
-use regex::Regex;
 use byteorder::{LittleEndian, BigEndian, ReadBytesExt};
 use log::{info};
 
@@ -113,8 +111,6 @@ impl fmt::Display for ParseError {
 
 /// Parse all other data besides battery voltage
 fn parse_other_data(timestamp: &NaiveDateTime, line_elements: &Vec<&str>) -> Result<StationDataType, ParseError> {
-    println!("line_elements: {:?}", line_elements);
-
     let air_temperature = line_elements[1].parse::<f64>()?;
     let air_relative_humidity = line_elements[2].parse::<f64>()?;
     let solar_radiation = line_elements[3].parse::<f64>()?;
@@ -150,31 +146,34 @@ pub fn parse_text_data(buffer: &[u8]) -> Result<StationDataType, ParseError> {
             if line_str.is_empty() {
                 Err(ParseError::EmptyBuffer)
             } else {
-                let re = Regex::new(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}").unwrap();
-                if re.is_match(line_str) {// Found valid time stamp
-                    // Prepare for parsing, split line at every ','
-                    let remove_junk = |c| c < '0' || c > '9';
-                    let line_elements: Vec<&str> = line_str.split(',').map(|elem| elem.trim_matches(&remove_junk)).collect();
-                    let timestamp = NaiveDateTime::parse_from_str(line_elements[0].trim_matches(&remove_junk), "%Y-%m-%d %H:%M:%S").unwrap();
-
-                    if line_elements.len() == 3 { // Only battery voltage
-                        let battery_voltage = line_elements[1].parse::<f64>();
-
-                        match battery_voltage {
-                            Ok(value) => {
-                                Ok(StationDataType::SimpleData(timestamp, value, 0.0, 0.0))
-                            },
-                            Err(e) => {
-                                Err(ParseError::ParseFloatError(e))
+                // Prepare for parsing, split line at every ','
+                let remove_junk = |c| c < '0' || c > '9';
+                let line_elements: Vec<&str> = line_str.split(',').map(|elem| elem.trim_matches(&remove_junk)).collect();
+
+                // The first column must be a valid time stamp, parse it directly
+                // instead of scanning the whole line with a regex first
+                match NaiveDateTime::parse_from_str(line_elements[0], "%Y-%m-%d %H:%M:%S") {
+                    Ok(timestamp) => {
+                        if line_elements.len() == 3 { // Only battery voltage
+                            let battery_voltage = line_elements[1].parse::<f64>();
+
+                            match battery_voltage {
+                                Ok(value) => {
+                                    Ok(StationDataType::SimpleData(timestamp, value, 0.0, 0.0))
+                                },
+                                Err(e) => {
+                                    Err(ParseError::ParseFloatError(e))
+                                }
                             }
+                        } else if line_elements.len() == 11 { // All data
+                            parse_other_data(&timestamp, &line_elements)
+                        } else {
+                            Err(ParseError::WrongNumberOfColumns)
                         }
-                    } else if line_elements.len() == 11 { // All data
-                        parse_other_data(&timestamp, &line_elements)
-                    } else {
-                        Err(ParseError::WrongNumberOfColumns)
+                    },
+                    Err(_) => {
+                        Err(ParseError::NoTimeStamp)
                     }
-                } else {
-                    Err(ParseError::NoTimeStamp)
                 }
             }
         },
@@ -185,7 +184,9 @@ pub fn parse_text_data(buffer: &[u8]) -> Result<StationDataType, ParseError> {
 }
 
 fn u32_to_timestamp(seconds: u32) -> NaiveDateTime {
-    let datetime_base = NaiveDateTime::parse_from_str("1990-01-01 00:00:00", "%Y-%m-%d %H:%M:%S").unwrap();
+    // Campbell time stamps count the seconds since 1990-01-01 00:00:00.
+    // Build the base date directly instead of parsing a string for every record.
+    let datetime_base = NaiveDate::from_ymd_opt(1990, 1, 1).unwrap().and_hms_opt(0, 0, 0).unwrap();
     datetime_base + Duration::seconds(seconds as i64)
 }
 
@@ -330,7 +331,12 @@ pub fn parse_binary_data(buffer: &[u8]) -> Vec<Result<StationDataType, ParseErro
                 result.push(parse_binary_data_battery(&buffer[3..]))
             } else if buffer.len() >= (HEADER_LENGTH + FULL_DATA_LENGTH) as usize {
                 // Looks like multiple data
-                for chunk in buffer[3..].chunks(FULL_DATA_LENGTH as usize) {
+                let chunks = buffer[3..].chunks(FULL_DATA_LENGTH as usize);
+
+                // The number of data sets is known up front, so allocate only once
+                result.reserve_exact(chunks.len());
+
+                for chunk in chunks {
                     result.push(parse_binary_data_multiple(&chunk));
                 }
             } else {
@@ -345,18 +351,13 @@ pub fn parse_binary_data(buffer: &[u8]) -> Vec<Result<StationDataType, ParseErro
 }
 
 fn open_and_read_file(filename: &str) -> Result<Vec<u8>, ParseError> {
-    let mut f = File::open(filename)?;
-
-    let mut whole_file = String::new();
-
-    f.read_to_string(&mut whole_file)?;
-
-    let mut result = Vec::new();
+    // Reads the whole file with one allocation (sized from the file metadata)
+    let whole_file = fs::read_to_string(filename)?;
 
-    for item in whole_file.split(',') {
-        let value = item.trim().parse::<u8>()?;
-        result.push(value);
-    }
+    // The file is a plain comma separated list of bytes, no quoting or escaping
+    let result = whole_file.split(',')
+        .map(|item| item.trim().parse::<u8>())
+        .collect::<Result<Vec<u8>, _>>()?;
 
     Ok(result)
 }
@@ -399,6 +400,12 @@ mod tests {
         assert_eq!(result, Err(ParseError::NoTimeStamp));
     }
 
+    #[test]
+    fn test_parse_text_data_header3() { // Time stamp not in the first column
+        let result = parse_text_data(b"7.56,\"2016-06-11 09:00:00\",0");
+        assert_eq!(result, Err(ParseError::NoTimeStamp));
+    }
+
     #[test]
     fn test_parse_text_data_correct1() { // All data from the station
         let result = parse_text_data(&[2, 0, 74, 34, 50, 48, 49, 54, 45, 48, 54, 45, 49, 49, 32, 48,
@@ -5,26 +5,28 @@
 use std::net::{TcpListener, TcpStream, SocketAddr};
 use std::thread::spawn;
 use std::io::prelude::*;
-use std::sync::{Arc, Mutex};
 use std::io;
 use std::process;
 use std::fs::File;
+use std::time::Duration;
 
 // External modules:
 use mysql;
-use mysql::{OptsBuilder, Pool, Value, prelude::Queryable};
-use chrono::Local;
+use mysql::{OptsBuilder, Pool, PooledConn, Value, prelude::Queryable};
+use chrono::{Datelike, Local, NaiveDateTime};
 use log::{info};
 
 
 // Internal modules:
-use crate::configuration::{Configuration, HEADER_LENGTH};
+use crate::configuration::{Configuration, HEADER_LENGTH, READ_TIMEOUT};
 use crate::data_parser::{parse_text_data, parse_binary_data, StationDataType};
 
 #[derive(Debug)]
 pub enum StoreDataError {
     IOError(io::Error),
     MySQLError(mysql::Error),
+    /// MySQL DATETIME (and the mysql driver) only support the years 1000 - 9999
+    InvalidTimeStamp(NaiveDateTime),
 }
 
 impl From<io::Error> for StoreDataError {
@@ -53,13 +55,26 @@ pub fn init_db(config: &Configuration) -> Pool {
     }
 }
 
+fn check_timestamp(timestamp: &NaiveDateTime) -> Result<(), StoreDataError> {
+    if timestamp.year() < 1000 || timestamp.year() > 9999 {
+        Err(StoreDataError::InvalidTimeStamp(*timestamp))
+    } else {
+        Ok(())
+    }
+}
+
 pub fn store_to_db(db_pool: &Pool, station_name: &str, data: &StationDataType) -> Result<(u64, u64), StoreDataError> {
-    let datetime_format = "%Y-%m-%d %H:%M:%S";
     let mut conn = db_pool.get_conn()?;
+    store_to_conn(&mut conn, station_name, data)
+}
 
+/// Store the data using an already open connection.
+/// Use this for several data sets in a row, so that the connection and the
+/// prepared INSERT statements (cached per connection) are reused.
+pub fn store_to_conn(conn: &mut PooledConn, station_name: &str, data: &StationDataType) -> Result<(u64, u64), StoreDataError> {
     match data {
-        &StationDataType::SimpleData(timestamp_tm, voltage1, voltage2, wind_diag) => {
-            let timestamp = timestamp_tm.format(&datetime_format);
+        &StationDataType::SimpleData(timestamp, voltage1, voltage2, wind_diag) => {
+            check_timestamp(&timestamp)?;
             conn.exec_drop("INSERT INTO battery_data (
                       timestamp,
                       station,
@@ -73,7 +88,7 @@ pub fn store_to_db(db_pool: &Pool, station_name: &str, data: &StationDataType) -
                       :li_battery_voltage,
                       :wind_dir
                    )", (
-                   Value::from(timestamp.to_string()),
+                   Value::from(timestamp),
                    Value::from(station_name),
                    Value::from(voltage1),
                    Value::from(voltage2),
@@ -82,7 +97,7 @@ pub fn store_to_db(db_pool: &Pool, station_name: &str, data: &StationDataType) -
             return Ok((conn.affected_rows(), conn.last_insert_id()));
         },
         &StationDataType::MultipleData(ref full_data_set) => {
-            let timestamp = full_data_set.timestamp.format(&datetime_format);
+            check_timestamp(&full_data_set.timestamp)?;
             conn.exec_drop("INSERT INTO multiple_data (
                     timestamp,
                     station,
@@ -110,7 +125,7 @@ pub fn store_to_db(db_pool: &Pool, station_name: &str, data: &StationDataType) -
                     :precipitation,
                     :air_pressure
                 )", (
-                    Value::from(timestamp.to_string()),
+                    Value::from(full_data_set.timestamp),
                     Value::from(station_name),
                     Value::from(full_data_set.air_temperature),
                     Value::from(full_data_set.air_relative_humidity),
@@ -128,45 +143,55 @@ pub fn store_to_db(db_pool: &Pool, station_name: &str, data: &StationDataType) -
     }
 }
 
-fn port_to_station(port: u16) -> String{
+fn port_to_station(port: u16) -> &'static str {
     match port {
-        2100 => "Nahuelbuta".to_string(),
-        2101 => "Santa_Gracia".to_string(),
-        2102 => "Pan_de_Azucar".to_string(),
-        2103 => "La_Campana".to_string(),
-        2104 => "Wanne_Tuebingen".to_string(),
-        2001 => "test1".to_string(),
-        2200 => "test2".to_string(),
-        _ => "unknown".to_string()
+        2100 => "Nahuelbuta",
+        2101 => "Santa_Gracia",
+        2102 => "Pan_de_Azucar",
+        2103 => "La_Campana",
+        2104 => "Wanne_Tuebingen",
+        2001 => "test1",
+        2200 => "test2",
+        _ => "unknown"
     }
 }
 
-fn handle_client(stream: &mut TcpStream, remote_addr: &SocketAddr,
-    db_pool: &Arc<Mutex<Pool>>) -> Result<(u64, u64), StoreDataError> {
-    let date_today = Local::now().format("%Y_%m_%d").to_string();
-    info!("Date: {}", date_today);
+fn handle_client(stream: &mut TcpStream, remote_addr: &SocketAddr, local_port: u16,
+    station_name: &str, db_pool: &Pool) -> Result<(u64, u64), StoreDataError> {
     info!("Client socket address: {}", remote_addr);
-
-    let local_addr = stream.local_addr()?;
-
-    let local_port = match local_addr {
-        SocketAddr::V4(local_addr) => local_addr.port(),
-        SocketAddr::V6(local_addr) => local_addr.port()
-    };
-
     info!("Port: {}", local_port);
 
+    // Don't let a client that never closes its socket keep this thread alive forever
+    stream.set_read_timeout(Some(Duration::new(READ_TIMEOUT, 0)))?;
+
     let mut tcp_buffer = Vec::new();
 
-    let len = stream.read_to_end(&mut tcp_buffer)?;
+    // On a timeout read_to_end keeps the bytes read so far in tcp_buffer,
+    // so go on with the partial upload instead of dropping it
+    let len = match stream.read_to_end(&mut tcp_buffer) {
+        Ok(len) => len,
+        Err(ref e) if e.kind() == io::ErrorKind::WouldBlock || e.kind() == io::ErrorKind::TimedOut => {
+            info!("[{}] Read timeout after {} seconds, using partial data", local_port, READ_TIMEOUT);
+            tcp_buffer.len()
+        },
+        Err(e) => return Err(StoreDataError::IOError(e))
+    };
     info!("[{}] Number of bytes received: {}", local_port, len);
 
-    // Write received binary data to disk
-    let station_name = port_to_station(local_port);
+    // Date and time of the finished upload, taken once so both parts of the file name match
+    let now = Local::now();
+    let date_today = now.format("%Y_%m_%d").to_string();
+    let time_now = now.format("%H_%M_%S").to_string();
+    info!("Date: {}", date_today);
+
+    // Write received binary data to disk.
+    // Connections are handled concurrently, so time and remote port make the file name
+    // unique per connection and two uploads never write into the same file.
+    let remote_port = remote_addr.port();
     let binary_filename = if len < 100 {
-        format!("old/binary/{}_small_{}.dat", station_name, date_today)
+        format!("old/binary/{}_small_{}_{}_{}.dat", station_name, date_today, time_now, remote_port)
     } else {
-        format!("old/binary/{}_full_{}.dat", station_name, date_today)
+        format!("old/binary/{}_full_{}_{}_{}.dat", station_name, date_today, time_now, remote_port)
     };
 
     info!("write binary file to: {}", binary_filename);
@@ -174,7 +199,7 @@ fn handle_client(stream: &mut TcpStream, remote_addr: &SocketAddr,
     {
         // Close file after this block
         let mut binary_file = File::create(binary_filename)?;
-        binary_file.write(&tcp_buffer)?;
+        binary_file.write_all(&tcp_buffer)?;
     }
 
     if tcp_buffer.len() > HEADER_LENGTH {
@@ -198,12 +223,7 @@ fn handle_client(stream: &mut TcpStream, remote_addr: &SocketAddr,
             match parse_text_data(&buffer_right) {
                 Ok(parsed_data) => {
                     info!("Data parsed correctly");
-                    match db_pool.lock() {
-                        Ok(db_pool) => {
-                            store_to_db(&db_pool, &station_name, &parsed_data)?;
-                        },
-                        Err(e) => info!("Mutex (poison) error (db_pool): {}", e)
-                    }
+                    store_to_db(db_pool, &station_name, &parsed_data)?;
                 },
                 Err(e) => {
                     info!("Could not parse data: {}", e);
@@ -212,22 +232,29 @@ fn handle_client(stream: &mut TcpStream, remote_addr: &SocketAddr,
         } else {
             info!("Parse binary data for {}", &station_name);
 
-            for (counter, parsed_data) in parse_binary_data(&buffer_right).iter().enumerate() {
+            let all_data = parse_binary_data(&buffer_right);
+            let mut valid_data = Vec::new();
+
+            for (counter, parsed_data) in all_data.iter().enumerate() {
                 match *parsed_data {
                     Ok(ref parsed_data) => {
                         info!("Data parsed correctly ({})", counter + 1);
-                        match db_pool.lock() {
-                            Ok(db_pool) => {
-                                store_to_db(&db_pool, &station_name, &parsed_data)?;
-                            },
-                            Err(e) => info!("Mutex (poison) error (db_pool): {}", e)
-                        }
+                        valid_data.push(parsed_data);
                     },
                     Err(ref e) => {
                         info!("Could not parse data: {}", e);
                     }
                 }
             }
+
+            if !valid_data.is_empty() {
+                // One connection for all data sets in this transmission
+                let mut conn = db_pool.get_conn()?;
+
+                for parsed_data in valid_data {
+                    store_to_conn(&mut conn, &station_name, parsed_data)?;
+                }
+            }
         }
     } else if tcp_buffer.len() < HEADER_LENGTH {
         info!("[{}] Invalid header (less than {} bytes received)!", local_port, HEADER_LENGTH);
@@ -251,7 +278,7 @@ pub fn start_service(config: &Configuration) {
         match TcpListener::bind(("0.0.0.0", *port)) {
             Ok(listener) => {
                 info!("Create listener for port {}", port);
-                listeners.push(listener);
+                listeners.push((listener, *port));
             },
             Err(e) => {
                 info!("Network error: {}", e);
@@ -260,21 +287,31 @@ pub fn start_service(config: &Configuration) {
         }
     }
 
-    let db_pool = Arc::new(Mutex::new(init_db(&config)));
+    // The pool is thread safe and cheap to clone, so each listener gets its own
+    // handle instead of sharing one behind a mutex.
+    let db_pool = init_db(&config);
 
-    for listener in listeners {
+    for (listener, port) in listeners {
         let cloned_pool = db_pool.clone();
+        // The station name only depends on the port, so look it up once per listener
+        let station_name = port_to_station(port);
         spawn(move|| {
             loop {
                 let result = listener.accept();
                 if let Ok(result) = result {
                     let (mut stream, addr) = result;
-                    match handle_client(&mut stream, &addr, &cloned_pool) {
-                        Ok(query_result) => { info!("Database insert successful: {}, {}",
-                            query_result.0,  query_result.1) },
-                        Err(StoreDataError::MySQLError(db_error)) => { info!("DB Error: {}", db_error) },
-                        Err(StoreDataError::IOError(io_error)) => { info!("IO Error: {}", io_error) },
-                    }
+                    let db_pool = cloned_pool.clone();
+                    // Handle each connection in its own thread, so a slow upload
+                    // does not block the next one on the same port
+                    spawn(move|| {
+                        match handle_client(&mut stream, &addr, port, station_name, &db_pool) {
+                            Ok(query_result) => { info!("Database insert successful: {}, {}",
+                                query_result.0,  query_result.1) },
+                            Err(StoreDataError::MySQLError(db_error)) => { info!("DB Error: {}", db_error) },
+                            Err(StoreDataError::IOError(io_error)) => { info!("IO Error: {}", io_error) },
+                            Err(StoreDataError::InvalidTimeStamp(timestamp)) => { info!("Invalid time stamp: {}", timestamp) },
+                        }
+                    });
                 }
             }
         });
@@ -294,8 +331,8 @@ mod tests {
     use log::{info};
 
     use crate::configuration::Configuration;
-    use crate::data_parser::{StationDataType, WeatherStationData};
-    use super::{store_to_db, port_to_station, start_service};
+    use crate::data_parser::{parse_text_data, StationDataType, WeatherStationData};
+    use super::{store_to_db, port_to_station, start_service, check_timestamp, StoreDataError};
 
     #[test]
     fn test_port_to_station() {
@@ -307,6 +344,27 @@ mod tests {
         assert_eq!(port_to_station(2105), "unknown");
     }
 
+    #[test]
+    fn test_check_timestamp1() {
+        let timestamp = NaiveDateTime::parse_from_str("2016-06-12 12:13:14", "%Y-%m-%d %H:%M:%S").unwrap();
+        assert!(check_timestamp(&timestamp).is_ok());
+    }
+
+    #[test]
+    fn test_check_timestamp2() { // Year out of range for the database, but valid for the text parser
+        let data = parse_text_data(b"\"0999-01-01 00:00:00\",12.73,0").unwrap();
+
+        match data {
+            StationDataType::SimpleData(timestamp, _, _, _) => {
+                match check_timestamp(&timestamp) {
+                    Err(StoreDataError::InvalidTimeStamp(value)) => assert_eq!(value, timestamp),
+                    _ => panic!("Expected InvalidTimeStamp")
+                }
+            },
+            _ => panic!("Expected SimpleData")
+        }
+    }
+
     #[test]
     fn test_store_to_db1() {
         // let _ = init(LogConfig { log_to_file: true, format: detailed_format, .. LogConfig::new() }, Some("info".to_string()));
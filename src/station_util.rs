@@ -7,7 +7,6 @@ extern crate clap;
 extern crate mysql;
 
 extern crate time;
-extern crate regex;
 extern crate chrono;
 extern crate byteorder;
 